@@ -10,6 +10,8 @@ from gi.repository import Gdk
 
 FONT = ('Monospace', cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
 LAYOUT = 'latam'  # es-latam layout
+LEXICONS_DIR = 'lexicons'  # <LAYOUT>.txt, one word per line
+LAYOUTS_DIR = 'layouts'  # <LAYOUT>.json, written by optimize.py
 INTRO_KEY = '↲'
 DEL_KEY = '←'
 TAB_KEY = '⇄'
@@ -23,6 +25,9 @@ MAYUS_KEYS = {'↾': [0, 'Never'],
               '⇧': [1, 'StartOnly'],
               '⇈': [2, 'Forever']}
 
+# Letter rows loaded by load_layout(), None keeps the default key
+ROWS = {}
+
 SPECIALS_SHIFT = {'<': '>',
                   '{': '[',
                   '}': ']',
@@ -124,12 +129,55 @@ class KeysDict(object):
         elif value in self.uppers:
             return self.uppers.index(value)
 
+    def set_row(self, n):
+        if n not in ROWS:
+            return
+
+        for idx, key in enumerate(ROWS[n]):
+            if key is not None:
+                self.lowers[idx] = key
+                self.uppers[idx] = key.upper()
+
 
 def set_mayus_key(key):
     global MAYUS_KEY
     MAYUS_KEY = key
 
 
+def is_letter(key):
+    return len(key) == 1 and key.isalpha()
+
+
+def load_layout(path):
+    with open(path) as _file:
+        rows = json.load(_file)['rows']
+
+    defaults = {2: KEYS2, 3: KEYS3, 4: KEYS4}
+    ROWS.clear()
+
+    letters = []
+    moved = []
+    for n, keys in rows.items():
+        n = int(n)
+        default = defaults[n]().lowers if n in defaults else []
+
+        # Only letters move, and they must land on the letter keys.
+        if len(keys) != len(default) or any(
+                (key is not None) != is_letter(lowed)
+                for key, lowed in zip(keys, default)):
+            raise ValueError('layout %s does not match %s' % (path, LAYOUT))
+
+        letters += [lowed for lowed in default if is_letter(lowed)]
+        moved += [key for key in keys if key is not None]
+
+    if sorted(letters) != sorted(moved):
+        raise ValueError('layout %s is not a permutation of the %s letters' %
+                         (path, LAYOUT))
+
+    for n, keys in rows.items():
+        ROWS[int(n)] = keys
+
+
 class KEYS1(KeysDict):
 
     def __init__(self):
@@ -148,6 +196,8 @@ class KEYS2(KeysDict):
         self.lowers = [u'⇄', 'q', 'w', 'e', 'r', 't', 'y', 'i', 'o', 'p']
         self.uppers = [u'⇄', 'Q', 'W', 'E', 'R', 'T', 'Y', 'I', 'O', 'P']
 
+        self.set_row(2)
+
 
 class KEYS3(KeysDict):
 
@@ -161,6 +211,8 @@ class KEYS3(KeysDict):
             self.lowers.insert(-2, 'ñ')
             self.uppers.insert(-2, 'Ñ')
 
+        self.set_row(3)
+
 
 class KEYS4(KeysDict):
 
@@ -172,6 +224,8 @@ class KEYS4(KeysDict):
         self.uppers = [
             MAYUS_KEY, '>', 'Z', 'X', 'C', 'V', 'B', 'N', 'M', ';', ':', '_']
 
+        self.set_row(4)
+
 
 class KEYS5(KeysDict):
 
@@ -223,6 +277,17 @@ def get_mayus_key(mayus, text, key):
     return _key
 
 
+def get_mayus_word(mayus, text, word):
+    if mayus == 'Forever':
+        return word.upper()
+
+    elif mayus == 'StartOnly' and (
+            text.endswith('\n') or text.strip().endswith('.') or not text):
+        return word.capitalize()
+
+    return word
+
+
 def gdk_to_cairo(color):
     return (color.red / 65535.0, color.green / 65535.0, color.blue / 65535.0)
 
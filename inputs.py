@@ -0,0 +1,434 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import socket
+import collections
+
+from urllib.parse import parse_qsl
+
+from gi.repository import GLib
+from gi.repository import GObject
+
+try:
+    import evdev
+    from evdev import ecodes
+except ImportError:
+    evdev = None
+
+
+# External producers write one sample per line:
+#     <x> <y> [<pressed>] [<timestamp>]
+# x and y are normalized to 0..1 over the keyboard area, pressed is 0 or 1
+# and timestamp is a time.monotonic() value taken when the sample was read
+# from the device, used to measure the input-to-selection latency.
+SAMPLE_FORMAT = '%f %f %d %f\n'
+
+SMOOTHING = 0.4
+JITTER = 0.002
+QUEUE_SIZE = 8
+MAX_AGE = 0.1  # Seconds
+
+
+class PointerFilter(object):
+
+    def __init__(self, smoothing=SMOOTHING, jitter=JITTER):
+        self.smoothing = smoothing
+        self.jitter = jitter
+        self.position = None
+
+    def filter(self, x, y):
+        if self.position is None:
+            self.position = (x, y)
+            return self.position
+
+        old_x, old_y = self.position
+        if abs(x - old_x) <= self.jitter and abs(y - old_y) <= self.jitter:
+            return None
+
+        alpha = 1.0 - self.smoothing
+        self.position = (old_x + (x - old_x) * alpha,
+                         old_y + (y - old_y) * alpha)
+
+        return self.position
+
+    def reset(self):
+        self.position = None
+
+
+class SampleQueue(object):
+
+    def __init__(self, size=QUEUE_SIZE, max_age=MAX_AGE):
+        self.samples = collections.deque(maxlen=size)
+        self.max_age = max_age
+        self.dropped = 0
+
+    def push(self, sample):
+        if len(self.samples) == self.samples.maxlen:
+            self.dropped += 1
+
+        self.samples.append(sample)
+
+    def pop_latest(self):
+        if not self.samples:
+            return None
+
+        sample = self.samples.pop()
+        self.dropped += len(self.samples)
+        self.samples.clear()
+
+        if time.monotonic() - sample[2] > self.max_age:
+            self.dropped += 1
+            return None
+
+        return sample
+
+    def __len__(self):
+        return len(self.samples)
+
+
+class LatencyMeter(object):
+
+    def __init__(self):
+        self.reset()
+
+    def record(self, latency):
+        self.count += 1
+        self.total += latency
+        self.last = latency
+        self.maximum = max(self.maximum, latency)
+
+    def get_mean(self):
+        if not self.count:
+            return 0.0
+
+        return self.total / self.count
+
+    def to_dict(self):
+        return {'count': self.count,
+                'mean': self.get_mean(),
+                'max': self.maximum}
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.maximum = 0.0
+
+
+class InputSource(GObject.GObject):
+
+    __gsignals__ = {
+        'motion': (GObject.SIGNAL_RUN_FIRST, None, [float, float, float]),
+        'button-press': (GObject.SIGNAL_RUN_FIRST, None, []),
+        'button-release': (GObject.SIGNAL_RUN_FIRST, None, []),
+        }
+
+    def __init__(self, smoothing=SMOOTHING, jitter=JITTER,
+                 queue_size=QUEUE_SIZE, max_age=MAX_AGE):
+        GObject.GObject.__init__(self)
+
+        self.filter = PointerFilter(smoothing, jitter)
+        self.queue = SampleQueue(queue_size, max_age)
+        self.pressed = False
+        self._flush_id = None
+
+    def push_sample(self, x, y, pressed=None, timestamp=None):
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        position = self.filter.filter(x, y)
+        if position is not None:
+            self.queue.push((position[0], position[1], timestamp))
+
+            if self._flush_id is None:
+                self._flush_id = GLib.idle_add(self.__idle_flush_cb)
+
+        if pressed is not None and pressed != self.pressed:
+            # Buttons must act on the position the user was pointing at.
+            self.__flush()
+            self.pressed = pressed
+            self.emit('button-press' if pressed else 'button-release')
+
+    def __flush(self):
+        if self._flush_id is not None:
+            GLib.source_remove(self._flush_id)
+            self._flush_id = None
+
+        sample = self.queue.pop_latest()
+        if sample is not None:
+            self.emit('motion', *sample)
+
+    def __idle_flush_cb(self):
+        self._flush_id = None
+        self.__flush()
+        return False
+
+    def start(self):
+        pass
+
+    def stop(self):
+        if self._flush_id is not None:
+            GLib.source_remove(self._flush_id)
+            self._flush_id = None
+
+        self.queue.samples.clear()
+        self.filter.reset()
+
+
+class StreamInputSource(InputSource):
+
+    def __init__(self, fd, **kwargs):
+        InputSource.__init__(self, **kwargs)
+
+        self.fd = fd
+        self._buffer = b''
+        self._watch_id = None
+
+    def start(self):
+        self._watch_id = GLib.io_add_watch(
+            self.fd, GLib.PRIORITY_HIGH,
+            GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR, self.__read_cb)
+
+    def stop(self):
+        if self._watch_id is not None:
+            GLib.source_remove(self._watch_id)
+            self._watch_id = None
+
+        InputSource.stop(self)
+
+    def __read_cb(self, fd, condition):
+        if not condition & GLib.IO_IN:
+            self._watch_id = None
+            self.closed()
+            return False
+
+        try:
+            data = os.read(self.fd, 4096)
+        except OSError:
+            data = b''
+
+        if not data:
+            self._watch_id = None
+            self.closed()
+            return False
+
+        lines = (self._buffer + data).split(b'\n')
+        self._buffer = lines.pop()
+
+        for line in lines:
+            self.parse_line(line)
+
+        return True
+
+    def parse_line(self, line):
+        values = line.split()
+        if len(values) < 2:
+            return
+
+        try:
+            x = float(values[0])
+            y = float(values[1])
+            pressed = bool(int(values[2])) if len(values) > 2 else None
+            timestamp = float(values[3]) if len(values) > 3 else None
+        except ValueError:
+            return
+
+        self.push_sample(x, y, pressed, timestamp)
+
+    def closed(self):
+        os.close(self.fd)
+
+
+class SocketInputSource(StreamInputSource):
+
+    def __init__(self, path, **kwargs):
+        StreamInputSource.__init__(self, None, **kwargs)
+
+        self.path = path
+        self.socket = None
+        self._accept_id = None
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        _socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            _socket.bind(self.path)
+            _socket.listen(1)
+        except OSError:
+            _socket.close()
+            raise
+
+        self.socket = _socket
+
+        self._accept_id = GLib.io_add_watch(
+            self.socket.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN,
+            self.__accept_cb)
+
+    def stop(self):
+        if self._accept_id is not None:
+            GLib.source_remove(self._accept_id)
+            self._accept_id = None
+
+        StreamInputSource.stop(self)
+        self.closed()
+
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+            os.unlink(self.path)
+
+    def __accept_cb(self, fd, condition):
+        client, address = self.socket.accept()
+
+        # Only one producer at a time, the newest one wins.
+        StreamInputSource.stop(self)
+        self.closed()
+
+        self.fd = os.dup(client.fileno())
+        self._buffer = b''
+        client.close()
+        StreamInputSource.start(self)
+
+        return True
+
+    def closed(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class EvdevInputSource(InputSource):
+
+    def __init__(self, device_path, **kwargs):
+        InputSource.__init__(self, **kwargs)
+
+        if evdev is None:
+            raise ImportError('python-evdev is required to read %s' %
+                              device_path)
+
+        self.device = evdev.InputDevice(device_path)
+        self.x = 0.5
+        self.y = 0.5
+        self._watch_id = None
+        self._ranges = {}
+
+        capabilities = self.device.capabilities(absinfo=True)
+        for code, info in capabilities.get(ecodes.EV_ABS, []):
+            if code in (ecodes.ABS_X, ecodes.ABS_Y):
+                self._ranges[code] = (info.min, info.max)
+
+    def start(self):
+        self._watch_id = GLib.io_add_watch(
+            self.device.fd, GLib.PRIORITY_HIGH,
+            GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR, self.__read_cb)
+
+    def stop(self):
+        if self._watch_id is not None:
+            GLib.source_remove(self._watch_id)
+            self._watch_id = None
+
+        InputSource.stop(self)
+
+    def __read_cb(self, fd, condition):
+        pressed = None
+
+        if not condition & GLib.IO_IN:
+            self._watch_id = None
+            self.closed()
+            return False
+
+        try:
+            events = list(self.device.read())
+        except BlockingIOError:
+            return True
+        except OSError:
+            # The device was unplugged.
+            self._watch_id = None
+            self.closed()
+            return False
+
+        for event in events:
+            if event.type == ecodes.EV_ABS and event.code in self._ranges:
+                minimum, maximum = self._ranges[event.code]
+                value = (event.value - minimum) / float(maximum - minimum)
+                if event.code == ecodes.ABS_X:
+                    self.x = value
+                else:
+                    self.y = value
+
+            elif event.type == ecodes.EV_REL:
+                # Relative devices are scaled as if 1000 counts cross
+                # the whole keyboard.
+                if event.code == ecodes.REL_X:
+                    self.x = min(1.0, max(0.0, self.x + event.value / 1000.0))
+                elif event.code == ecodes.REL_Y:
+                    self.y = min(1.0, max(0.0, self.y + event.value / 1000.0))
+
+            elif event.type == ecodes.EV_KEY and event.code == ecodes.BTN_LEFT:
+                pressed = bool(event.value)
+
+            elif event.type == ecodes.EV_SYN:
+                self.push_sample(self.x, self.y, pressed)
+                pressed = None
+
+        return True
+
+    def closed(self):
+        InputSource.stop(self)
+        self.device.close()
+
+
+def send_sample(producer, x, y, pressed=False, timestamp=None):
+    """Writes a sample to a socket or file descriptor, stand-in producers
+    and tests use it to drive a source without a real device."""
+
+    if timestamp is None:
+        timestamp = time.monotonic()
+
+    data = (SAMPLE_FORMAT % (x, y, int(pressed), timestamp)).encode()
+
+    if isinstance(producer, socket.socket):
+        producer.sendall(data)
+    else:
+        os.write(producer, data)
+
+
+# Options accepted after '?' in an input source spec
+OPTIONS = {'smoothing': float,
+           'jitter': float,
+           'queue_size': int,
+           'max_age': float}
+
+
+def get_input_source(spec, **kwargs):
+    """Builds a source from a 'kind:target[?option=value&...]' string, e.g.
+    'socket:/tmp/gaze?smoothing=0.6&jitter=0.001', 'fd:3' or
+    'evdev:/dev/input/event5'. Options are the keys of OPTIONS."""
+
+    if not spec:
+        return None
+
+    spec, _, query = spec.partition('?')
+    for name, value in parse_qsl(query):
+        if name not in OPTIONS:
+            raise ValueError('unknown input source option: %s' % name)
+
+        kwargs[name] = OPTIONS[name](value)
+
+    kind, _, target = spec.partition(':')
+
+    if kind == 'socket':
+        return SocketInputSource(target, **kwargs)
+
+    elif kind == 'fd':
+        return StreamInputSource(int(target), **kwargs)
+
+    elif kind == 'evdev':
+        return EvdevInputSource(target, **kwargs)
+
+    else:
+        raise ValueError('unknown input source: %s' % spec)
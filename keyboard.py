@@ -1,8 +1,15 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
 import json
+import logging
+import time
 import globals as G
+import inputs
+import metrics
+import swipe
+import render
 import gi
 gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk
@@ -12,6 +19,7 @@ from gi.repository import GObject
 
 from sugar3.activity import activity
 from sugar3.graphics.toolbutton import ToolButton
+from sugar3.graphics.toggletoolbutton import ToggleToolButton
 from sugar3.graphics.toolbarbox import ToolbarBox
 from sugar3.graphics.colorbutton import ColorToolButton
 from sugar3.activity.widgets import _create_activity_icon as ActivityIcon
@@ -44,8 +52,13 @@ class Key(GObject.GObject):
         self.label_color = G.COLORS['key-letter']
 
     def render(self):
+        self.update()
+        self.get_frame().draw(self.context)
+        self.check_selected()
+
+    def update(self):
         if self.lower_key == G.INTRO_KEY:
-            self.render_as_intro_key()
+            self.update_as_intro_key()
             return
 
         else:
@@ -60,44 +73,7 @@ class Key(GObject.GObject):
             self._center[1] - self._mouse_position[1] * self._increment
         self.font_size = self.height / 6 * 5.0
 
-        if self.selected:
-            self.context.set_source_rgba(*self.selected_color)
-        else:
-            self.context.set_source_rgba(*self.normal_color)
-
-        self.context.rectangle(self.x, self.y, self.width, self.height)
-        self.context.fill()
-
-        self.render_label()
-        self.check_selected()
-
-    def render_label(self):
-        key = G.get_mayus_key(self.mayus, self._text, self)
-        if key == 'SPACE':
-            return
-
-        self.context.set_font_size(self.font_size)
-        self.context.select_font_face(*G.FONT)
-        x = self.x + (
-            self.width / 2.0) - (self.context.text_extents(key)[3] / 2.0)
-        y = self.y + (
-            self.height / 2.0) + (self.context.text_extents(key)[4] / 2.0)
-        if self.lower_key == '-':
-            x -= self.context.text_extents(key)[3] * 3.0
-
-        elif self.lower_key == '.':
-            x -= self.context.text_extents(key)[3] * 1.5
-            y += (self.context.text_extents(key)[4] / 4.0)
-
-        elif self.lower_key == ',':
-            x -= self.context.text_extents(key)[3] / 1.5
-
-        self.context.set_source_rgba(*self.label_color)
-        self.context.move_to(x, y)
-
-        self.context.show_text(key)
-
-    def render_as_intro_key(self):
+    def update_as_intro_key(self):
         self.font_size = self._size[0] / len(G.KEYS1()) * self._increment
         self.width = \
             self._size[0] / float(len(G.KEYS1()) - 1) * self._increment
@@ -106,26 +82,8 @@ class Key(GObject.GObject):
         self.y = self.height * 2 + self._center[1] - \
             self._mouse_position[1] * self._increment
 
-        key = G.get_mayus_key(self.mayus, self._text, self)
-
-        if self.selected:
-            self.context.set_source_rgba(*self.selected_color)
-        else:
-            self.context.set_source_rgba(*self.normal_color)
-
-        self.context.rectangle(self.x, self.y, self.width, self.height)
-        self.context.fill()
-
-        self.context.set_font_size(self.font_size)
-        x = self.x + (
-            self.width / 2.0) - (self.context.text_extents(key)[2] / 2.0)
-        y = self.y + (
-            self.height / 2.0) + (self.context.text_extents(key)[3] / 2.0)
-        self.context.set_source_rgba(*self.label_color)
-        self.context.move_to(x, y)
-        self.context.show_text(key)
-
-        self.check_selected()
+    def get_frame(self):
+        return render.KeyFrame(self)
 
     def check_selected(self):
         within = self._mouse_position[0] > self.x and \
@@ -145,7 +103,11 @@ class Key(GObject.GObject):
 class KeyBoard(Gtk.DrawingArea):
 
     __gsignals__ = {
-        'text-changed': (GObject.SIGNAL_RUN_FIRST, None, [object])
+        'text-changed': (GObject.SIGNAL_RUN_FIRST, None, [object]),
+        'key-selected': (GObject.SIGNAL_RUN_FIRST, None, [object]),
+        'key-unselected': (GObject.SIGNAL_RUN_FIRST, None, [object]),
+        'word-selected': (GObject.SIGNAL_RUN_FIRST, None, [object]),
+        'mayus-pressed': (GObject.SIGNAL_RUN_FIRST, None, [object]),
         }
 
     def __init__(self):
@@ -167,6 +129,14 @@ class KeyBoard(Gtk.DrawingArea):
         self.selected_color = G.COLORS['key-selected']
         self.label_color = G.COLORS['key-letter']
         self.background_color = G.COLORS['background']
+        self.input_source = None
+        self.input_handlers = []
+        self.sample_time = None
+        self.latency = inputs.LatencyMeter()
+        self.swipe = False
+        self.swipe_decoder = None
+        self.swipe_path = None
+        self.render_thread = None
 
         self.set_size_request(640, 480)
         self.set_events(Gdk.EventMask.POINTER_MOTION_MASK |
@@ -176,6 +146,7 @@ class KeyBoard(Gtk.DrawingArea):
 
         self.connect('draw', self.__draw_cb)
         self.connect('motion-notify-event', self.__motion_notify_event)
+        self.connect('button-press-event', self.__button_press_event_cb)
         self.connect('button-release-event', self.__button_release_event_cb)
         self.connect('scroll-event', self.__scroll_event)
 
@@ -188,35 +159,123 @@ class KeyBoard(Gtk.DrawingArea):
             atn.width * self.increment, atn.height * self.increment)
         self.center = (atn.width / 2.0, atn.height / 2.0)
 
+        if not self.keys:
+            self.create_keys()
+
+        if self.render_thread is None:
+            self.render()
+            return
+
+        if self.render_thread.size != self.size:
+            self.render()
+
+        if not self.render_thread.paint(context):
+            self.render_background()
+
+    def create_keys(self):
         l1, l2 = G.KEYS1() + G.KEYS2()
         _l1, _l2 = G.KEYS3() + G.KEYS4()
         l = l1 + _l1 + ['SPACE']
 
-        if not self.keys:
-            for lowed in l:
-                _list, n = G.get_in_list(lowed)
-                upped = _list[lowed]
-                key = Key(lowed, upped, self.context)
-                key.connect('selected', self.__selected_key)
-                key.connect('unselected', self.__unselected_key)
-                self.keys.append(key)
-
-        self.render()
+        for lowed in l:
+            _list, n = G.get_in_list(lowed)
+            upped = _list[lowed]
+            key = Key(lowed, upped, self.context)
+            key.connect('selected', self.__selected_key)
+            key.connect('unselected', self.__unselected_key)
+            self.keys.append(key)
 
     def __motion_notify_event(self, widget, event):
-        self.mouse_position = (event.x, event.y)
+        self.move_pointer(event.x, event.y)
+
+    def __button_press_event_cb(self, widget, event):
+        if event.button == 1:
+            self.start_swipe()
+
+    def __button_release_event_cb(self, widget, event):
+        if event.button == 1:
+            self.release_pointer()
+
+    def __source_motion_cb(self, source, x, y, timestamp):
+        self.move_pointer(x * self.size[0], y * self.size[1], timestamp)
+
+    def __source_button_press_cb(self, source):
+        self.start_swipe()
+
+    def __source_button_release_cb(self, source):
+        self.release_pointer()
+
+    def set_input_source(self, source):
+        if self.input_source is not None:
+            for handler in self.input_handlers:
+                self.input_source.disconnect(handler)
+
+            self.input_source.stop()
+
+        self.input_source = None
+        self.input_handlers = []
+
+        if source is not None:
+            # Only a started source is kept, so a failing one leaves the
+            # mouse in charge.
+            source.start()
+
+            self.input_source = source
+            self.input_handlers = [
+                source.connect('motion', self.__source_motion_cb),
+                source.connect('button-press', self.__source_button_press_cb),
+                source.connect('button-release',
+                               self.__source_button_release_cb)]
+
+    def move_pointer(self, x, y, timestamp=None):
+        if self.context is None:
+            return
+
+        self.sample_time = timestamp
+        self.mouse_position = (x, y)
         self.calculate_pos()
         self.render()
+
+        if self.swipe_path is not None:
+            self.swipe_path.append(self.get_layout_position())
+
+        self.sample_time = None
         GObject.idle_add(self.queue_draw)
 
-    def __button_release_event_cb(self, widget, event):
-        if event.button == 1:
-            if self.selected_key:
-                if self.selected_key.lower_key in G.MAYUS_KEYS.keys():
-                    self.next_mayus(self.selected_key)
-                    return
+    def get_layout_position(self):
+        # Inverse of Key.render, in swipe.KEY_UNITS wide rows.
+        u = (self.mouse_position[0] - self.x) / (
+            self.size[0] * self.increment) * swipe.KEY_UNITS
+        v = (self.mouse_position[1] - self.y) / (
+            self.size[1] / 6.0 * self.increment)
+
+        return (u, v)
 
-                self.emit('text-changed', self.selected_key)
+    def start_swipe(self):
+        if self.swipe and self.swipe_decoder is not None and \
+                self.context is not None:
+            self.swipe_path = [self.get_layout_position()]
+
+    def release_pointer(self):
+        path = self.swipe_path
+        self.swipe_path = None
+
+        if path is not None:
+            words = self.swipe_decoder.decode(path)
+            if words:
+                self.emit('word-selected', words)
+                return
+
+        self.activate_selected_key()
+
+    def activate_selected_key(self):
+        if self.selected_key:
+            if self.selected_key.lower_key in G.MAYUS_KEYS.keys():
+                self.emit('mayus-pressed', self.selected_key)
+                self.next_mayus(self.selected_key)
+                return
+
+            self.emit('text-changed', self.selected_key)
 
     def __scroll_event(self, widget, event):
         if event.direction == Gdk.ScrollDirection.UP:
@@ -249,14 +308,35 @@ class KeyBoard(Gtk.DrawingArea):
         key.mayus_key = simbol
         G.set_mayus_key(simbol)
 
+        self.redraw()
+
+    def redraw(self):
+        # In threaded mode the draw callback only paints the last frame,
+        # so state changes must request a new one.
+        if self.render_thread is not None:
+            self.render_keys()
+
         GObject.idle_add(self.queue_draw)
 
     def calculate_pos(self):
         self.x = self.center[0] - self.mouse_position[0] * self.increment
         self.y = self.center[1] - self.mouse_position[1] * self.increment
 
+    def set_threaded_rendering(self, threaded):
+        if self.render_thread is not None:
+            self.render_thread.stop()
+            self.render_thread = None
+
+        if threaded:
+            self.render_thread = render.RenderThread(self.queue_draw)
+            self.render_thread.start()
+
+        GObject.idle_add(self.queue_draw)
+
     def render(self):
-        self.render_background()
+        if self.render_thread is None:
+            self.render_background()
+
         self.render_keys()
 
     def render_background(self):
@@ -278,7 +358,20 @@ class KeyBoard(Gtk.DrawingArea):
             key.selected_color = self.selected_color
             key.label_color = self.label_color
 
-            key.render()
+            if self.render_thread is None:
+                key.render()
+            else:
+                key.update()
+                key.check_selected()
+
+        # Only selection happens here, the worker thread draws the frame.
+        if self.render_thread is not None:
+            self.render_thread.request(self.get_frame())
+
+    def get_frame(self):
+        return render.KeyBoardFrame(
+            self.size, self.background_color,
+            [key.get_frame() for key in self.keys], self.get_scale_factor())
 
     def set_text(self, text):
         self.text = text
@@ -287,10 +380,17 @@ class KeyBoard(Gtk.DrawingArea):
     def __selected_key(self, key):
         self.selected_key = key
 
+        if self.sample_time is not None:
+            self.latency.record(time.monotonic() - self.sample_time)
+
+        self.emit('key-selected', key)
+
     def __unselected_key(self, key):
         if self.selected_key == key:
             self.selected_key = None
 
+        self.emit('key-unselected', key)
+
 
 class DasherActivity(activity.Activity):
 
@@ -299,31 +399,58 @@ class DasherActivity(activity.Activity):
 
         self.clipboard = Gtk.Clipboard.get(Gdk.SELECTION_CLIPBOARD)
         self.text = ''
+        self.metrics = metrics.TypingMetrics()
+        self.sessions = []
+        self.last_word = None
 
         self.view = Gtk.TextView()
         self.buffer = self.view.get_buffer()
         self.area = KeyBoard()
         vbox = Gtk.VBox()
         scrolled = Gtk.ScrolledWindow()
+        self.suggestions = Gtk.HBox()
 
         scrolled.set_size_request(-1, 100)
         self.view.modify_font(Pango.FontDescription('25'))
 
-        self.connect('destroy', Gtk.main_quit)
+        self.connect('destroy', self.__destroy_cb)
         self.buffer.connect('changed', self._buffer_changed)
         self.buffer.connect('notify::cursor-position', self._cursor_moved)
         self.area.connect('text-changed', self.text_changed)
+        self.area.connect('key-selected', self.__key_selected_cb)
+        self.area.connect('key-unselected', self.__key_unselected_cb)
+        self.area.connect('word-selected', self.word_selected)
+        self.area.connect('mayus-pressed', self.__mayus_pressed_cb)
         self.area.connect('motion-notify-event', self.__motion_notify_event)
 
         self.load_data()
+        self.load_layout()
+        self.load_lexicon()
         self.make_toolbar()
 
+        # Head trackers, eye-gaze software or evdev devices can drive the
+        # keyboard too, see inputs.get_input_source().
+        try:
+            self.area.set_input_source(
+                inputs.get_input_source(os.environ.get('DASHER_INPUT')))
+        except (ValueError, ImportError, OSError) as error:
+            # A broken input source must not stop the activity.
+            logging.error('Using the mouse only: %s', error)
+        self.area.set_threaded_rendering(
+            bool(os.environ.get('DASHER_THREADED_RENDER')))
+
         scrolled.add(self.view)
         vbox.pack_start(scrolled, False, False, 0)
+        vbox.pack_start(self.suggestions, False, False, 0)
         vbox.pack_start(self.area, True, True, 0)
         self.set_canvas(vbox)
         self.show_all()
 
+    def __destroy_cb(self, widget):
+        self.area.set_input_source(None)
+        self.area.set_threaded_rendering(False)
+        Gtk.main_quit()
+
     def _buffer_changed(self, _buffer):
         start = _buffer.get_start_iter()
         end = _buffer.get_iter_at_mark(_buffer.get_selection_bound())
@@ -333,7 +460,60 @@ class DasherActivity(activity.Activity):
     def _cursor_moved(self, _buffer, event):
         self._buffer_changed(_buffer)
 
+    def __key_selected_cb(self, widget, key):
+        self.metrics.key_selected(key)
+
+    def __key_unselected_cb(self, widget, key):
+        self.metrics.key_unselected(key)
+
+    def word_selected(self, widget, words):
+        text = G.get_mayus_word(self.area.mayus, self.text, words[0])
+        if self.text and not self.text[-1].isspace():
+            text = ' ' + text
+
+        offset = self.buffer.get_iter_at_mark(
+            self.buffer.get_insert()).get_offset()
+
+        self.metrics.word_entered(text)
+        self.buffer.insert_at_cursor(text)
+        self.last_word = (offset, text)
+        self.set_suggestions(words[1:])
+
+    def set_suggestions(self, words):
+        for button in self.suggestions.get_children():
+            self.suggestions.remove(button)
+
+        for word in words:
+            button = Gtk.Button(label=word)
+            button.connect('clicked', self.__suggestion_clicked_cb, word)
+            self.suggestions.pack_start(button, False, False, 0)
+
+        self.suggestions.show_all()
+
+    def __suggestion_clicked_cb(self, button, word):
+        offset, text = self.last_word
+        start = self.buffer.get_iter_at_offset(offset)
+        end = self.buffer.get_iter_at_offset(offset + len(text))
+
+        if self.buffer.get_text(start, end, 0) == text:
+            prefix = ' ' if text.startswith(' ') else ''
+            word = prefix + G.get_mayus_word(
+                self.area.mayus, self.buffer.get_text(
+                    self.buffer.get_start_iter(), start, 0), word)
+
+            self.buffer.delete(start, end)
+            self.buffer.insert(start, word)
+            self.last_word = (offset, word)
+
+        self.set_suggestions([])
+
+    def __mayus_pressed_cb(self, widget, key):
+        self.metrics.key_pressed(key)
+
     def text_changed(self, widget, key):
+        self.set_suggestions([])
+        count = self.buffer.get_char_count()
+
         text = key.lower_key
         if text != G.DEL_KEY:
             text = G.get_mayus_key(self.area.mayus, self.text, key)
@@ -363,6 +543,10 @@ class DasherActivity(activity.Activity):
                     self.buffer.get_selection_bound())
                 self.buffer.backspace(_end, True, True)
 
+        # A DEL can remove a whole selection, or nothing at the start.
+        deleted = max(0, count - self.buffer.get_char_count())
+        self.metrics.key_pressed(key, deleted)
+
     def copy_text(self, widget=None):
         start, end = self.buffer.get_bounds()
         text = self.buffer.get_text(start, end, 0)
@@ -422,6 +606,15 @@ class DasherActivity(activity.Activity):
 
         toolbar.insert(make_separator(size=30), -1)
 
+        button_swipe = ToggleToolButton('swipe')
+        button_swipe.set_tooltip('Type whole words by sweeping across keys.')
+        button_swipe.set_active(self.area.swipe)
+        button_swipe.set_sensitive(self.area.swipe_decoder is not None)
+        button_swipe.connect('toggled', self._swipe_toggled)
+        toolbar.insert(button_swipe, -1)
+
+        toolbar.insert(make_separator(size=30), -1)
+
         button_normal = ColorToolButton()
         button_normal.set_color(G.cairo_to_gdk(self.area.normal_color))
         button_normal.set_title('Choose a color for the buttons.')
@@ -463,17 +656,24 @@ class DasherActivity(activity.Activity):
 
         self.set_toolbar_box(toolbar_box)
 
+    def _swipe_toggled(self, widget):
+        self.area.swipe = widget.get_active()
+
     def _normal_color_changed(self, widget):
         self.area.normal_color = G.gdk_to_cairo(widget.get_color())
+        self.area.redraw()
 
     def _selected_color_changed(self, widget):
         self.area.selected_color = G.gdk_to_cairo(widget.get_color())
+        self.area.redraw()
 
     def _label_color_changed(self, widget):
         self.area.label_color = G.gdk_to_cairo(widget.get_color())
+        self.area.redraw()
 
     def _background_color_changed(self, widget):
         self.area.background_color = G.gdk_to_cairo(widget.get_color())
+        self.area.redraw()
 
     def load_data(self):
         if 'normal-color' in self.metadata:
@@ -489,12 +689,37 @@ class DasherActivity(activity.Activity):
             self.area.increment = float(self.metadata['increment'])
             self.buffer.set_text(str(eval(self.metadata['text'])))
 
+            # Swipe typing stays off unless it was turned on.
+            if 'swipe' in self.metadata:
+                self.area.swipe = json.loads(self.metadata['swipe'])
+
         else:
             self.area.normal_color = G.COLORS['key-button']
             self.area.selected_color = G.COLORS['key-selected']
             self.area.label_color = G.COLORS['key-letter']
             self.area.background_color = G.COLORS['background']
 
+    def load_layout(self):
+        path = os.path.join(activity.get_bundle_path(), G.LAYOUTS_DIR,
+                            G.LAYOUT + '.json')
+
+        if os.path.exists(path):
+            try:
+                G.load_layout(path)
+            except (ValueError, KeyError) as error:
+                # A stale or broken layout must not stop the activity.
+                logging.error('Using the default layout: %s', error)
+
+    def load_lexicon(self):
+        # DASHER_LEXICON points to another word list, one word per line
+        # with the most frequent first.
+        path = os.environ.get('DASHER_LEXICON') or os.path.join(
+            activity.get_bundle_path(), G.LEXICONS_DIR, G.LAYOUT + '.txt')
+
+        if os.path.exists(path):
+            lexicon = swipe.Lexicon.from_file(path)
+            self.area.swipe_decoder = swipe.SwipeDecoder(lexicon)
+
     def write_file(self, file_path):
         normal_color = json.dumps(list(self.area.normal_color))
         key_selected_color = json.dumps(list(self.area.selected_color))
@@ -509,6 +734,36 @@ class DasherActivity(activity.Activity):
         self.metadata['background-color'] = background_color
         self.metadata['increment'] = self.area.increment
         self.metadata['text'] = json.dumps(text)
+        self.metadata['swipe'] = json.dumps(self.area.swipe)
+
+        if self.metrics.keystrokes:
+            session = self.metrics.to_dict()
+            session['latency'] = self.area.latency.to_dict()
+            sessions = self.sessions + [session]
+        else:
+            sessions = self.sessions
+
+        sessions = sessions[-metrics.MAX_SESSIONS:]
+
+        # The per-key and bigram tables go to the Journal file, metadata
+        # has to stay small.
+        self.metadata['typing-sessions'] = json.dumps(
+            [metrics.get_summary(session)
+             for session in sessions[-metrics.MAX_SUMMARIES:]])
+
+        with open(file_path, 'w') as _file:
+            json.dump({'typing-sessions': sessions}, _file)
+
+    def read_file(self, file_path):
+        with open(file_path) as _file:
+            try:
+                data = json.load(_file)
+            except ValueError:
+                # Entries saved before the sessions moved here are empty.
+                return
+
+        self.sessions = data.get('typing-sessions', [])
 
     def set_normal_color(self, button):
         self.area.normal_color = G.gdk_to_cairo(button.get_color())
+        self.area.redraw()
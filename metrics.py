@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import globals as G
+
+
+CHARS_PER_WORD = 5.0
+MAX_SESSIONS = 100  # Sessions kept in the Journal file
+MAX_SUMMARIES = 10  # Session summaries kept in the Journal metadata
+SUMMARY = ('wpm', 'kspc', 'error-rate', 'elapsed', 'latency')
+
+
+class KeyStats(object):
+
+    def __init__(self):
+        self.count = 0
+        self.dwell = 0.0
+        self.travel = 0.0
+
+    def add(self, dwell, travel):
+        self.count += 1
+        self.dwell += dwell
+        self.travel += travel
+
+    def to_dict(self):
+        count = float(max(self.count, 1))
+        return {'count': self.count,
+                'dwell': self.dwell / count,
+                'travel': self.travel / count}
+
+
+class TypingMetrics(object):
+    """Streaming text-entry metrics, only running totals are kept so
+    memory doesn't grow with the length of the session."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.keystrokes = 0
+        self.backspaces = 0
+        self.characters = 0
+        self.first_time = None
+        self.last_time = None
+        self.keys = {}
+        self.bigrams = {}
+
+        self._selected_key = None
+        self._selected_time = None
+        self._activated_time = None
+        self._activated_key = None
+
+    def key_selected(self, key, timestamp=None):
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        self._selected_key = key.lower_key
+        self._selected_time = timestamp
+
+    def key_unselected(self, key):
+        if self._selected_key == key.lower_key:
+            self._selected_key = None
+            self._selected_time = None
+
+    def key_pressed(self, key, deleted=1, timestamp=None):
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        name = key.lower_key
+        if self.first_time is None:
+            self.first_time = timestamp
+
+        self.keystrokes += 1
+        self.last_time = timestamp
+
+        if name == G.DEL_KEY:
+            self.backspaces += 1
+            self.characters = max(0, self.characters - deleted)
+        elif name not in G.MAYUS_KEYS:
+            # Shift presses are keystrokes that don't enter a character.
+            self.characters += 1
+
+        dwell = 0.0
+        travel = 0.0
+        if self._selected_key == name and self._selected_time is not None:
+            dwell = timestamp - self._selected_time
+
+            if self._activated_time is not None:
+                travel = max(0.0, self._selected_time - self._activated_time)
+
+        if name not in self.keys:
+            self.keys[name] = KeyStats()
+
+        self.keys[name].add(dwell, travel)
+
+        if self._activated_key is not None:
+            following = self.bigrams.setdefault(self._activated_key, {})
+            following[name] = following.get(name, 0) + 1
+
+        self._activated_time = timestamp
+        self._activated_key = name
+
+        # Pressing the same key again measures dwell from this press.
+        if self._selected_key == name:
+            self._selected_time = timestamp
+
+    def word_entered(self, word, timestamp=None):
+        # A swiped word is a single selection that enters the whole word.
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        if self.first_time is None:
+            self.first_time = timestamp
+
+        self.keystrokes += 1
+        self.characters += len(word)
+        self.last_time = timestamp
+        self._activated_time = timestamp
+        self._activated_key = None
+
+    def get_elapsed(self):
+        if self.first_time is None:
+            return 0.0
+
+        return self.last_time - self.first_time
+
+    def get_wpm(self):
+        # The first character starts the clock, so it isn't counted.
+        elapsed = self.get_elapsed()
+        if elapsed <= 0 or self.characters < 2:
+            return 0.0
+
+        return (self.characters - 1) / CHARS_PER_WORD / (elapsed / 60.0)
+
+    def get_kspc(self):
+        if not self.characters:
+            return 0.0
+
+        return self.keystrokes / float(self.characters)
+
+    def get_error_rate(self):
+        if not self.keystrokes:
+            return 0.0
+
+        return self.backspaces / float(self.keystrokes)
+
+    def to_dict(self):
+        return {'wpm': self.get_wpm(),
+                'kspc': self.get_kspc(),
+                'error-rate': self.get_error_rate(),
+                'keystrokes': self.keystrokes,
+                'backspaces': self.backspaces,
+                'characters': self.characters,
+                'elapsed': self.get_elapsed(),
+                'keys': dict((name, stats.to_dict())
+                             for name, stats in self.keys.items()),
+                'bigrams': self.bigrams}
+
+
+def get_summary(session):
+    return dict((name, session[name]) for name in SUMMARY if name in session)
@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Searches letter arrangements that minimize the expected pointer travel,
+measured with Fitts' law, for the given usage statistics.
+
+    python optimize.py --corpus text.txt --output layouts/latam.json
+    python optimize.py --sessions typing-sessions.json ...
+
+Sessions files are the Journal files saved by the activity, holding the
+typing sessions with their key bigrams.
+"""
+
+import sys
+import json
+import math
+import random
+import argparse
+import multiprocessing
+
+import globals as G
+from swipe import KEY_UNITS
+
+
+SPACE = 'SPACE'
+ROWS = (2, 3, 4)
+ITERATIONS = 20000
+TEMPERATURE = 1.0
+COOLING = 0.9995
+
+
+def get_rows():
+    return {2: G.KEYS2().lowers, 3: G.KEYS3().lowers, 4: G.KEYS4().lowers}
+
+
+def get_slots(rows):
+    # (row, index, u, v, width) of every letter, which are the only keys
+    # the optimizer moves.
+    slots = []
+    letters = []
+    for n in ROWS:
+        keys = rows[n]
+        width = KEY_UNITS / len(keys)
+        for idx, key in enumerate(keys):
+            if len(key) == 1 and key.isalpha():
+                slots.append((n, idx, (idx + 0.5) * width, n + 0.5, width))
+                letters.append(key)
+
+    return slots, letters
+
+
+def get_fitts_cost(distance, width):
+    return math.log(distance / width + 1, 2)
+
+
+def get_extent(du, dv, width, height=1.0):
+    # Size of a width x height key along the direction of the motion.
+    if not du:
+        return height
+    if not dv:
+        return width
+
+    return min(width / abs(du), height / abs(dv)) * math.hypot(du, dv)
+
+
+def get_costs(slots):
+    # The space bar spans the whole keyboard, so it's always reached
+    # straight down from a letter and back up, both ways across 1 row.
+    space = len(slots)
+    costs = [[0.0] * (space + 1) for x in range(space + 1)]
+
+    for i, (n1, idx1, u1, v1, w1) in enumerate(slots):
+        for j, (n2, idx2, u2, v2, w2) in enumerate(slots):
+            du, dv = u2 - u1, v2 - v1
+            costs[i][j] = get_fitts_cost(
+                math.hypot(du, dv), get_extent(du, dv, w2))
+
+        costs[i][space] = get_fitts_cost(5.5 - v1, 1.0)
+        costs[space][i] = get_fitts_cost(5.5 - v1, 1.0)
+
+    return costs
+
+
+def read_corpus(path, letters):
+    bigrams = {}
+    previous = None
+    with open(path) as _file:
+        for line in _file:
+            for char in line.lower():
+                if char in letters:
+                    name = char
+                elif char.isspace():
+                    name = SPACE
+                else:
+                    previous = None
+                    continue
+
+                if previous is not None and not (
+                        previous == SPACE and name == SPACE):
+                    following = bigrams.setdefault(previous, {})
+                    following[name] = following.get(name, 0) + 1
+
+                previous = name
+
+    return bigrams
+
+
+def read_sessions(path):
+    with open(path) as _file:
+        sessions = json.load(_file).get('typing-sessions', [])
+
+    bigrams = merge_bigrams(
+        session.get('bigrams', {}) for session in sessions)
+
+    if not bigrams:
+        raise ValueError('%s has no typing sessions with bigrams' % path)
+
+    return bigrams
+
+
+def merge_bigrams(tables):
+    bigrams = {}
+    for table in tables:
+        for a, following in table.items():
+            counts = bigrams.setdefault(a, {})
+            for b, count in following.items():
+                counts[b] = counts.get(b, 0) + count
+
+    return bigrams
+
+
+def get_transitions(bigrams, letters):
+    # Transitions as (a, b, weight) over letter indexes, len(letters)
+    # standing for the space bar.
+    indexes = dict((letter, i) for i, letter in enumerate(letters))
+    indexes[SPACE] = len(letters)
+
+    total = float(sum(sum(following.values())
+                      for following in bigrams.values())) or 1.0
+
+    transitions = []
+    for a, following in bigrams.items():
+        for b, count in following.items():
+            if a in indexes and b in indexes and (a != SPACE or b != SPACE):
+                transitions.append((indexes[a], indexes[b], count / total))
+
+    return transitions
+
+
+class Problem(object):
+
+    def __init__(self, costs, transitions, count):
+        self.costs = costs
+        self.transitions = transitions
+        self.count = count
+        self.involving = [[] for x in range(count)]
+
+        for transition in transitions:
+            a, b, weight = transition
+            if a < count:
+                self.involving[a].append(transition)
+            if b < count and b != a:
+                self.involving[b].append(transition)
+
+    def get_cost(self, positions):
+        return sum(weight * self.costs[positions[a]][positions[b]]
+                   for a, b, weight in self.transitions)
+
+    def get_partial_cost(self, positions, letters):
+        seen = set()
+        cost = 0.0
+        for letter in letters:
+            for transition in self.involving[letter]:
+                if id(transition) not in seen:
+                    seen.add(id(transition))
+                    a, b, weight = transition
+                    cost += weight * self.costs[positions[a]][positions[b]]
+
+        return cost
+
+    def anneal(self, seed, iterations=ITERATIONS):
+        rand = random.Random(seed)
+
+        # positions[letter] is the slot of a letter, the space bar is fixed.
+        positions = list(range(self.count)) + [self.count]
+        if seed:
+            head = positions[:self.count]
+            rand.shuffle(head)
+            positions[:self.count] = head
+
+        cost = self.get_cost(positions)
+        best = (cost, list(positions))
+        temperature = TEMPERATURE * cost / max(self.count, 1)
+
+        for x in range(iterations):
+            a, b = rand.sample(range(self.count), 2)
+            before = self.get_partial_cost(positions, (a, b))
+            positions[a], positions[b] = positions[b], positions[a]
+            delta = self.get_partial_cost(positions, (a, b)) - before
+
+            if delta <= 0 or rand.random() < math.exp(-delta / temperature):
+                cost += delta
+                if cost < best[0]:
+                    best = (cost, list(positions))
+            else:
+                positions[a], positions[b] = positions[b], positions[a]
+
+            temperature *= COOLING
+
+        return best
+
+
+def _anneal(args):
+    problem, seed, iterations = args
+    return problem.anneal(seed, iterations)
+
+
+def optimize(bigrams, restarts=None, iterations=ITERATIONS):
+    rows = get_rows()
+    slots, letters = get_slots(rows)
+    problem = Problem(get_costs(slots), get_transitions(bigrams, letters),
+                      len(letters))
+
+    # Seed 0 starts from the current layout, so it never gets worse.
+    restarts = restarts or multiprocessing.cpu_count()
+    jobs = [(problem, seed, iterations) for seed in range(restarts)]
+
+    pool = multiprocessing.Pool()
+    try:
+        results = pool.map(_anneal, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+    cost, positions = min(results)
+
+    layout = dict((n, [None] * len(rows[n])) for n in ROWS)
+    for letter, slot in zip(letters, positions):
+        n, idx = slots[slot][:2]
+        layout[n][idx] = letter
+
+    return layout, problem.get_cost(list(range(len(letters) + 1))), cost
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--corpus', action='append', default=[])
+    parser.add_argument('--sessions', action='append', default=[])
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--restarts', type=int, default=None)
+    parser.add_argument('--iterations', type=int, default=ITERATIONS)
+    args = parser.parse_args(argv)
+
+    if not args.corpus and not args.sessions:
+        parser.error('at least one --corpus or --sessions is required')
+
+    letters = set(get_slots(get_rows())[1])
+    tables = [read_corpus(path, letters) for path in args.corpus]
+    try:
+        tables += [read_sessions(path) for path in args.sessions]
+    except ValueError as error:
+        parser.error(str(error))
+
+    layout, before, after = optimize(
+        merge_bigrams(tables), args.restarts, args.iterations)
+
+    with open(args.output, 'w') as _file:
+        json.dump({'layout': G.LAYOUT, 'rows': layout}, _file, indent=4)
+
+    print('Expected Fitts cost per keystroke: %.4f -> %.4f' % (
+        before, after))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import cairo
+import logging
+import threading
+import globals as G
+
+from gi.repository import GObject
+
+
+class KeyFrame(object):
+    """What is needed to draw a key, copied from it so the drawing can
+    happen away from the main thread."""
+
+    def __init__(self, key):
+        self.lower_key = key.lower_key
+        self.label = G.get_mayus_key(key.mayus, key._text, key)
+        self.x = key.x
+        self.y = key.y
+        self.width = key.width
+        self.height = key.height
+        self.font_size = key.font_size
+        self.selected = key.selected
+        self.normal_color = key.normal_color
+        self.selected_color = key.selected_color
+        self.label_color = key.label_color
+
+    def draw(self, context):
+        if self.selected:
+            context.set_source_rgba(*self.selected_color)
+        else:
+            context.set_source_rgba(*self.normal_color)
+
+        context.rectangle(self.x, self.y, self.width, self.height)
+        context.fill()
+
+        if self.lower_key == G.INTRO_KEY:
+            self.draw_intro_label(context)
+        else:
+            self.draw_label(context)
+
+    def draw_label(self, context):
+        key = self.label
+        if key == 'SPACE':
+            return
+
+        context.set_font_size(self.font_size)
+        context.select_font_face(*G.FONT)
+        x = self.x + (
+            self.width / 2.0) - (context.text_extents(key)[3] / 2.0)
+        y = self.y + (
+            self.height / 2.0) + (context.text_extents(key)[4] / 2.0)
+        if self.lower_key == '-':
+            x -= context.text_extents(key)[3] * 3.0
+
+        elif self.lower_key == '.':
+            x -= context.text_extents(key)[3] * 1.5
+            y += (context.text_extents(key)[4] / 4.0)
+
+        elif self.lower_key == ',':
+            x -= context.text_extents(key)[3] / 1.5
+
+        context.set_source_rgba(*self.label_color)
+        context.move_to(x, y)
+
+        context.show_text(key)
+
+    def draw_intro_label(self, context):
+        key = self.label
+
+        context.set_font_size(self.font_size)
+        x = self.x + (
+            self.width / 2.0) - (context.text_extents(key)[2] / 2.0)
+        y = self.y + (
+            self.height / 2.0) + (context.text_extents(key)[3] / 2.0)
+        context.set_source_rgba(*self.label_color)
+        context.move_to(x, y)
+        context.show_text(key)
+
+
+class KeyBoardFrame(object):
+
+    def __init__(self, size, background_color, keys, scale=1):
+        self.size = (int(size[0]), int(size[1]))
+        self.scale = scale
+        self.background_color = background_color
+        self.keys = keys
+
+    def draw(self, context):
+        context.set_source_rgba(*self.background_color)
+        context.rectangle(0, 0, self.size[0], self.size[1])
+        context.fill()
+
+        for key in self.keys:
+            key.draw(context)
+
+
+class RenderThread(threading.Thread):
+    """Draws the newest requested frame into the back buffer and swaps it
+    with the front one, pending frames that weren't started are dropped."""
+
+    def __init__(self, callback):
+        threading.Thread.__init__(self)
+
+        self.daemon = True
+        self.callback = callback
+        self.condition = threading.Condition()
+        self.pending = None
+        self.front = None
+        self.back = None
+        self.size = None
+        self.running = True
+
+    def request(self, frame):
+        with self.condition:
+            self.pending = frame
+            self.condition.notify()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+        # A frame being drawn must not present after this returns.
+        self.join()
+
+    def paint(self, context):
+        # Holding the lock keeps the front buffer from being swapped and
+        # drawn into while it's being painted.
+        with self.condition:
+            if self.front is None:
+                return False
+
+            context.set_source_surface(self.front, 0, 0)
+            context.paint()
+
+        return True
+
+    def get_back_buffer(self, size, scale):
+        # Buffers have device pixels, so HiDPI screens stay sharp.
+        width, height = size[0] * scale, size[1] * scale
+        if self.back is None or (
+                self.back.get_width(), self.back.get_height()) != (
+                width, height):
+            self.back = cairo.ImageSurface(cairo.FORMAT_RGB24, width, height)
+            self.back.set_device_scale(scale, scale)
+
+        return self.back
+
+    def __present_cb(self):
+        if self.running:
+            self.callback()
+
+        return False
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and self.pending is None:
+                    self.condition.wait()
+
+                if not self.running:
+                    return
+
+                frame = self.pending
+                self.pending = None
+
+            # pycairo releases the GIL while drawing, so the main thread
+            # keeps handling events meanwhile.
+            surface = self.get_back_buffer(frame.size, frame.scale)
+            try:
+                frame.draw(cairo.Context(surface))
+            except Exception:
+                # Keep the worker alive, the next frame may draw fine.
+                logging.exception('Could not draw the keyboard')
+                continue
+
+            surface.flush()
+
+            with self.condition:
+                self.back = self.front
+                self.front = surface
+                self.size = frame.size
+
+                if self.running:
+                    GObject.idle_add(self.__present_cb)
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import math
+import unicodedata
+import globals as G
+
+
+# Positions are in layout units: a row is 1 unit high and every row is
+# KEY_UNITS wide, whatever the number of keys on it.
+KEY_UNITS = 10.0
+SAMPLES = 24
+RADIUS = 0.8  # Keys closer than this to the path count as crossed
+MIN_LENGTH = 0.8  # Shorter paths are taps, not swipes
+FREQUENCY_WEIGHT = 0.05
+MAX_CANDIDATES = 64
+
+
+def get_key_centers():
+    centers = {}
+    for n, keys in enumerate([G.KEYS1(), G.KEYS2(), G.KEYS3(), G.KEYS4()]):
+        for idx, key in enumerate(keys.lowers):
+            if len(key) == 1 and key.isalpha():
+                u = (idx + 0.5) / len(keys) * KEY_UNITS
+                centers[key] = (u, n + 1.5)
+
+    return centers
+
+
+def squeeze(word):
+    # Double letters don't change the shape of the path.
+    letters = []
+    for letter in word:
+        if not letters or letters[-1] != letter:
+            letters.append(letter)
+
+    return ''.join(letters)
+
+
+def fold(word):
+    # Accented vowels are typed with the plain key, ñ has its own.
+    letters = []
+    for letter in word:
+        if letter != 'ñ':
+            letter = ''.join(
+                char for char in unicodedata.normalize('NFD', letter)
+                if not unicodedata.combining(char))
+
+        letters.append(letter)
+
+    return ''.join(letters)
+
+
+def resample(points, count=SAMPLES):
+    if len(points) == 1:
+        return list(points) * count
+
+    lengths = [0.0]
+    for (x1, y1), (x2, y2) in zip(points, points[1:]):
+        lengths.append(lengths[-1] + math.hypot(x2 - x1, y2 - y1))
+
+    total = lengths[-1]
+    if total == 0:
+        return [points[0]] * count
+
+    result = []
+    segment = 1
+    for i in range(count):
+        distance = total * i / float(count - 1)
+        while segment < len(points) - 1 and lengths[segment] < distance:
+            segment += 1
+
+        start = lengths[segment - 1]
+        length = lengths[segment] - start
+        t = (distance - start) / length if length else 0.0
+        (x1, y1), (x2, y2) = points[segment - 1], points[segment]
+        result.append((x1 + (x2 - x1) * t, y1 + (y2 - y1) * t))
+
+    return result
+
+
+def get_path_length(points):
+    return sum(math.hypot(x2 - x1, y2 - y1)
+               for (x1, y1), (x2, y2) in zip(points, points[1:]))
+
+
+class Lexicon(object):
+    """Words bucketed by the first and last letter of their folded
+    spelling, in frequency order."""
+
+    def __init__(self, words=()):
+        self.buckets = {}
+        self.ranks = {}
+
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        word = word.lower()
+        if not word or word in self.ranks:
+            return
+
+        self.ranks[word] = len(self.ranks)
+        letters = squeeze(fold(word))
+        bucket = (letters[0], letters[-1])
+        self.buckets.setdefault(bucket, []).append((word, letters))
+
+    def get_candidates(self, firsts, lasts):
+        # (word, letters to sweep) pairs
+        for first in firsts:
+            for last in lasts:
+                for candidate in self.buckets.get((first, last), []):
+                    yield candidate
+
+    def __len__(self):
+        return len(self.ranks)
+
+    def __contains__(self, word):
+        return word.lower() in self.ranks
+
+    @classmethod
+    def from_file(cls, path):
+        # One word per line, most frequent first.
+        lexicon = cls()
+        with open(path, encoding='utf-8') as _file:
+            for line in _file:
+                values = line.split()
+                if values:
+                    lexicon.add(values[0])
+
+        return lexicon
+
+
+class SwipeDecoder(object):
+
+    def __init__(self, lexicon, centers=None):
+        self.lexicon = lexicon
+        self.centers = centers or get_key_centers()
+        self.templates = {}
+
+    def get_near_keys(self, point, radius=RADIUS):
+        x, y = point
+        return set(key for key, (u, v) in self.centers.items()
+                   if math.hypot(u - x, v - y) < radius)
+
+    def get_crossed_keys(self, path):
+        crossed = []
+        for point in path:
+            keys = self.get_near_keys(point)
+            if keys and (not crossed or crossed[-1] != keys):
+                crossed.append(keys)
+
+        return crossed
+
+    def get_template(self, letters):
+        if letters not in self.templates:
+            points = [self.centers[letter] for letter in letters]
+            self.templates[letters] = (
+                resample(points), get_path_length(points))
+
+        return self.templates[letters]
+
+    def is_typeable(self, word):
+        return all(letter in self.centers for letter in word)
+
+    def matches(self, letters, crossed):
+        # The letters must be crossed in order, any keys in between.
+        i = 0
+        for letter in letters:
+            while i < len(crossed) and letter not in crossed[i]:
+                i += 1
+
+            if i == len(crossed):
+                return False
+
+        return True
+
+    def get_distance(self, path, template):
+        return sum(math.hypot(x1 - x2, y1 - y2)
+                   for (x1, y1), (x2, y2) in zip(path, template)) / len(path)
+
+    def decode(self, path, count=4):
+        if len(path) < 2:
+            return []
+
+        length = get_path_length(path)
+        if length < MIN_LENGTH:
+            return []
+
+        crossed = self.get_crossed_keys(path)
+        if len(crossed) < 2:
+            return []
+
+        points = resample(path)
+        candidates = []
+
+        for word, letters in self.lexicon.get_candidates(
+                crossed[0], crossed[-1]):
+            if len(letters) > len(crossed) or not self.is_typeable(letters):
+                continue
+
+            if not self.matches(letters, crossed):
+                continue
+
+            template, template_length = self.get_template(letters)
+            if length < template_length * 0.5 - RADIUS or \
+                    length > template_length * 2 + RADIUS * 2:
+                continue
+
+            score = self.get_distance(points, template) + FREQUENCY_WEIGHT * \
+                math.log(self.lexicon.ranks[word] + 1)
+
+            candidates.append((score, word))
+            if len(candidates) > MAX_CANDIDATES * 4:
+                candidates.sort()
+                del candidates[MAX_CANDIDATES:]
+
+        candidates.sort()
+        return [word for score, word in candidates[:count]]
@@ -0,0 +1,8 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+# The activity modules live at the top of the bundle.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
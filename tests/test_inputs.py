@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+import pytest
+
+pytest.importorskip('gi')
+
+from gi.repository import GLib
+
+import inputs
+
+
+def iterate(timeout=0.2):
+    context = GLib.MainContext.default()
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        context.iteration(False)
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def producer():
+    # A pipe stands in for a head tracker or eye-gaze producer.
+    read_fd, write_fd = os.pipe()
+    source = inputs.StreamInputSource(read_fd, smoothing=0, jitter=0.01)
+    motions = []
+    delivery = inputs.LatencyMeter()
+
+    def motion_cb(source, x, y, timestamp):
+        motions.append((x, y))
+        delivery.record(time.monotonic() - timestamp)
+
+    source.connect('motion', motion_cb)
+    source.start()
+
+    yield source, write_fd, motions, delivery
+
+    source.stop()
+    os.close(read_fd)
+    os.close(write_fd)
+
+
+def test_motion_is_delivered(producer):
+    source, write_fd, motions, delivery = producer
+
+    inputs.send_sample(write_fd, 0.25, 0.5)
+    iterate()
+
+    assert motions == [(0.25, 0.5)]
+    assert delivery.count == 1
+    assert 0 <= delivery.get_mean() < inputs.MAX_AGE
+
+
+def test_input_to_selection_latency():
+    pytest.importorskip('sugar3')
+    cairo = pytest.importorskip('cairo')
+
+    from gi.repository import Gdk
+    if Gdk.Display.get_default() is None:
+        pytest.skip('KeyBoard needs a display')
+
+    import keyboard
+
+    area = keyboard.KeyBoard()
+    surface = cairo.ImageSurface(cairo.FORMAT_RGB24, 640, 480)
+    area.context = cairo.Context(surface)
+    area.size = (640, 480)
+    area.center = (320, 240)
+    area.create_keys()
+
+    read_fd, write_fd = os.pipe()
+    area.set_input_source(inputs.StreamInputSource(read_fd, smoothing=0))
+
+    try:
+        # Points inside a key of the middle row.
+        inputs.send_sample(write_fd, 0.52, 0.55)
+        iterate()
+
+        assert area.selected_key is not None
+        assert area.latency.count == 1
+        assert 0 <= area.latency.get_mean() < inputs.MAX_AGE
+        assert area.latency.maximum >= area.latency.get_mean()
+
+    finally:
+        area.set_input_source(None)
+        os.close(read_fd)
+        os.close(write_fd)
+
+
+def test_jitter_is_filtered(producer):
+    source, write_fd, motions, delivery = producer
+
+    inputs.send_sample(write_fd, 0.25, 0.5)
+    iterate()
+    inputs.send_sample(write_fd, 0.255, 0.505)
+    iterate()
+
+    assert motions == [(0.25, 0.5)]
+
+
+def test_stale_samples_are_dropped(producer):
+    source, write_fd, motions, delivery = producer
+
+    inputs.send_sample(write_fd, 0.25, 0.5,
+                       timestamp=time.monotonic() - inputs.MAX_AGE * 2)
+    iterate()
+
+    assert motions == []
+    assert source.queue.dropped == 1
+
+
+def test_only_latest_sample_is_delivered(producer):
+    source, write_fd, motions, delivery = producer
+
+    for x in (0.1, 0.2, 0.3, 0.4):
+        inputs.send_sample(write_fd, x, 0.5)
+    iterate()
+
+    assert motions == [(0.4, 0.5)]
+    assert source.queue.dropped == 3
+
+
+def test_input_source_options():
+    source = inputs.get_input_source(
+        'fd:0?smoothing=0.6&jitter=0.001&queue_size=4&max_age=0.05')
+
+    assert source.filter.smoothing == 0.6
+    assert source.filter.jitter == 0.001
+    assert source.queue.samples.maxlen == 4
+    assert source.queue.max_age == 0.05
+
+    with pytest.raises(ValueError):
+        inputs.get_input_source('fd:0?speed=2')
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+# globals needs cairo and Gdk.
+pytest.importorskip('cairo')
+pytest.importorskip('gi')
+
+import globals as G
+import metrics
+
+
+class FakeKey(object):
+
+    def __init__(self, lower_key):
+        self.lower_key = lower_key
+
+
+def type_keys(typing, names, start=0.0, interval=1.0, dwell=0.25):
+    # Selects each key interval seconds apart and presses it after dwell.
+    timestamp = start
+    for name in names:
+        key = FakeKey(name)
+        typing.key_selected(key, timestamp)
+        typing.key_pressed(key, timestamp=timestamp + dwell)
+        typing.key_unselected(key)
+        timestamp += interval
+
+    return timestamp
+
+
+def test_wpm():
+    typing = metrics.TypingMetrics()
+    type_keys(typing, 'hello world')
+
+    # 11 characters over 10 seconds, the first one starts the clock.
+    assert typing.get_elapsed() == pytest.approx(10.0)
+    assert typing.get_wpm() == pytest.approx(10 / 5.0 / (10 / 60.0))
+
+
+def test_kspc_and_error_rate():
+    typing = metrics.TypingMetrics()
+    type_keys(typing, ['h', 'o', G.DEL_KEY, 'i'])
+
+    assert typing.characters == 2
+    assert typing.get_kspc() == pytest.approx(4 / 2.0)
+    assert typing.get_error_rate() == pytest.approx(1 / 4.0)
+
+
+def test_del_removes_a_selection():
+    typing = metrics.TypingMetrics()
+    type_keys(typing, 'hello')
+    typing.key_pressed(FakeKey(G.DEL_KEY), deleted=3, timestamp=10.0)
+
+    assert typing.characters == 2
+    assert typing.keystrokes == 6
+
+
+def test_mayus_counts_as_keystroke():
+    typing = metrics.TypingMetrics()
+    type_keys(typing, [G.MAYUS_KEY, 'h', 'i'])
+
+    assert typing.keystrokes == 3
+    assert typing.characters == 2
+    assert typing.get_kspc() == pytest.approx(1.5)
+
+
+def test_dwell_and_travel():
+    typing = metrics.TypingMetrics()
+    type_keys(typing, 'ab', interval=1.0, dwell=0.25)
+
+    keys = typing.to_dict()['keys']
+    assert keys['a'] == {'count': 1, 'dwell': 0.25, 'travel': 0.0}
+    # From pressing 'a' at 0.25 to selecting 'b' at 1.0.
+    assert keys['b']['dwell'] == pytest.approx(0.25)
+    assert keys['b']['travel'] == pytest.approx(0.75)
+
+
+def test_bigrams():
+    typing = metrics.TypingMetrics()
+    type_keys(typing, 'abab')
+
+    assert typing.bigrams == {'a': {'b': 2}, 'b': {'a': 1}}
+
+
+def test_summary_leaves_out_tables():
+    typing = metrics.TypingMetrics()
+    type_keys(typing, 'hola')
+    summary = metrics.get_summary(typing.to_dict())
+
+    assert set(summary) == set(['wpm', 'kspc', 'error-rate', 'elapsed'])
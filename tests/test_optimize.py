@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+
+import pytest
+
+# globals needs cairo and Gdk.
+pytest.importorskip('cairo')
+pytest.importorskip('gi')
+
+import globals as G
+import optimize
+
+CORPUS = '''la casa de mi madre tiene una ventana grande
+que da al jardin donde juegan los chicos cada tarde
+'''
+
+
+@pytest.fixture(autouse=True)
+def default_rows():
+    G.ROWS.clear()
+    yield
+    G.ROWS.clear()
+
+
+@pytest.fixture
+def layout_file(tmpdir):
+    corpus = tmpdir.join('corpus.txt')
+    corpus.write(CORPUS)
+
+    letters = set(optimize.get_slots(optimize.get_rows())[1])
+    bigrams = optimize.read_corpus(str(corpus), letters)
+    layout, before, after = optimize.optimize(
+        bigrams, restarts=2, iterations=2000)
+
+    assert after <= before
+
+    path = tmpdir.join('layout.json')
+    path.write(json.dumps({'layout': G.LAYOUT, 'rows': layout}))
+    return str(path), layout
+
+
+def get_letters():
+    return sorted(optimize.get_slots(optimize.get_rows())[1])
+
+
+def test_layout_round_trip(layout_file):
+    path, layout = layout_file
+    letters = get_letters()
+    defaults = optimize.get_rows()
+
+    G.load_layout(path)
+
+    rows = optimize.get_rows()
+    for n in optimize.ROWS:
+        assert rows[n] == [key if key is not None else lowed
+                           for key, lowed in zip(layout[n], defaults[n])]
+
+    assert get_letters() == letters
+
+    # Uppers follow their letters.
+    keys = G.KEYS3()
+    for lowed, upped in zip(keys.lowers, keys.uppers):
+        if G.is_letter(lowed):
+            assert upped == lowed.upper()
+
+
+def test_load_layout_rejects_repeated_letters(layout_file, tmpdir):
+    path, layout = layout_file
+    rows = dict((str(n), list(keys)) for n, keys in layout.items())
+    rows['2'][1] = rows['2'][2]
+
+    bad = tmpdir.join('bad.json')
+    bad.write(json.dumps({'rows': rows}))
+
+    with pytest.raises(ValueError):
+        G.load_layout(str(bad))
+
+    assert G.ROWS == {}
+
+
+def test_load_layout_rejects_other_row_lengths(layout_file, tmpdir):
+    path, layout = layout_file
+    rows = dict((str(n), list(keys)) for n, keys in layout.items())
+    rows['3'].pop(0)
+
+    bad = tmpdir.join('bad.json')
+    bad.write(json.dumps({'rows': rows}))
+
+    with pytest.raises(ValueError):
+        G.load_layout(str(bad))
+
+
+def test_read_sessions_needs_bigrams(tmpdir):
+    sessions = tmpdir.join('sessions.json')
+    sessions.write(json.dumps({'typing-sessions': [{'keys': {}}]}))
+
+    with pytest.raises(ValueError):
+        optimize.read_sessions(str(sessions))
+
+    sessions.write(json.dumps({'typing-sessions': [
+        {'bigrams': {'a': {'b': 2}}}, {'bigrams': {'a': {'b': 1}}}]}))
+
+    assert optimize.read_sessions(str(sessions)) == {'a': {'b': 3}}
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+cairo = pytest.importorskip('cairo')
+pytest.importorskip('gi')
+
+from gi.repository import GLib
+
+import render
+
+BACKGROUND = (0, 0, 1, 1)
+NORMAL = (1, 0, 0, 1)
+SELECTED = (0, 1, 0, 1)
+SIZE = (120, 60)
+
+
+def get_key(x, selected=False):
+    # Only what KeyFrame copies from a keyboard.Key.
+    return SimpleNamespace(
+        lower_key=' ', mayus_key=' ', mayus='Never', _text='', x=x, y=10,
+        width=40, height=40, font_size=10, selected=selected,
+        normal_color=NORMAL, selected_color=SELECTED, label_color=NORMAL)
+
+
+def get_frame(scale=1):
+    keys = [render.KeyFrame(get_key(10)),
+            render.KeyFrame(get_key(70, selected=True))]
+    return render.KeyBoardFrame(SIZE, BACKGROUND, keys, scale)
+
+
+def wait_for(presented, timeout=2.0):
+    context = GLib.MainContext.default()
+    end = time.monotonic() + timeout
+    while not presented and time.monotonic() < end:
+        context.iteration(False)
+        time.sleep(0.001)
+
+
+def get_pixel(surface, x, y):
+    surface.flush()
+    stride = surface.get_stride()
+    data = surface.get_data()
+    offset = y * stride + x * 4
+    # RGB24 is stored as native-endian 0x00RRGGBB.
+    blue, green, red = data[offset], data[offset + 1], data[offset + 2]
+    return (red, green, blue)
+
+
+@pytest.fixture
+def thread():
+    presented = []
+    thread = render.RenderThread(lambda: presented.append(True))
+    thread.start()
+
+    yield thread, presented
+
+    if thread.is_alive():
+        thread.stop()
+
+
+def test_frame_is_painted(thread):
+    thread, presented = thread
+    thread.request(get_frame())
+    wait_for(presented)
+
+    assert presented
+    assert thread.size == SIZE
+
+    surface = cairo.ImageSurface(cairo.FORMAT_RGB24, *SIZE)
+    assert thread.paint(cairo.Context(surface))
+
+    assert get_pixel(surface, 2, 2) == (0, 0, 255)
+    assert get_pixel(surface, 30, 30) == (255, 0, 0)
+    assert get_pixel(surface, 90, 30) == (0, 255, 0)
+
+
+def test_nothing_to_paint_before_a_frame(thread):
+    thread, presented = thread
+    surface = cairo.ImageSurface(cairo.FORMAT_RGB24, *SIZE)
+
+    assert not thread.paint(cairo.Context(surface))
+
+
+def test_hidpi_buffers(thread):
+    thread, presented = thread
+    thread.request(get_frame(scale=2))
+    wait_for(presented)
+
+    assert (thread.front.get_width(), thread.front.get_height()) == (
+        SIZE[0] * 2, SIZE[1] * 2)
+    assert thread.front.get_device_scale() == (2, 2)
+
+
+def test_draw_errors_keep_the_thread(thread):
+    thread, presented = thread
+    frame = get_frame()
+    frame.keys.append(None)
+    thread.request(frame)
+    wait_for(presented, timeout=0.2)
+
+    assert not presented
+    assert thread.front is None
+
+    thread.request(get_frame())
+    wait_for(presented)
+
+    assert presented
+    assert thread.is_alive()
+
+
+def test_stop_joins(thread):
+    thread, presented = thread
+    thread.request(get_frame())
+    thread.stop()
+
+    assert not thread.is_alive()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+import time
+
+import pytest
+
+# globals needs cairo and Gdk.
+pytest.importorskip('cairo')
+pytest.importorskip('gi')
+
+import swipe
+
+FRAME = 1 / 60.0
+
+
+def get_path(decoder, word, steps=8):
+    # The ideal sweep through the centers of the keys of a word.
+    centers = [decoder.centers[letter]
+               for letter in swipe.squeeze(swipe.fold(word))]
+
+    path = []
+    for (x1, y1), (x2, y2) in zip(centers, centers[1:]):
+        for i in range(steps):
+            t = i / float(steps)
+            path.append((x1 + (x2 - x1) * t, y1 + (y2 - y1) * t))
+
+    path.append(centers[-1])
+    return path
+
+
+def test_fold():
+    assert swipe.fold('información') == 'informacion'
+    assert swipe.fold('años') == 'años'
+    assert swipe.fold('pingüino') == 'pinguino'
+
+
+def test_decode():
+    lexicon = swipe.Lexicon(['casa', 'cosa', 'tiempo', 'mañana', 'manana'])
+    decoder = swipe.SwipeDecoder(lexicon)
+
+    for word in ['casa', 'cosa', 'tiempo', 'mañana']:
+        assert decoder.decode(get_path(decoder, word))[0] == word
+
+
+def test_decode_keeps_accents():
+    lexicon = swipe.Lexicon(['información', 'día', 'años'])
+    decoder = swipe.SwipeDecoder(lexicon)
+
+    assert decoder.decode(get_path(decoder, 'informacion'))[0] == \
+        'información'
+    assert decoder.decode(get_path(decoder, 'dia'))[0] == 'día'
+    assert decoder.decode(get_path(decoder, 'años'))[0] == 'años'
+
+
+def test_tap_is_not_a_swipe():
+    decoder = swipe.SwipeDecoder(swipe.Lexicon(['casa']))
+    center = decoder.centers['a']
+
+    assert decoder.decode([center, (center[0] + 0.1, center[1])]) == []
+
+
+def test_buckets_prune_first_and_last_letter():
+    lexicon = swipe.Lexicon(['ad', 'sad', 'as', 'add'])
+    decoder = swipe.SwipeDecoder(lexicon)
+
+    path = get_path(decoder, 'ad')
+    crossed = decoder.get_crossed_keys(path)
+    candidates = [word for word, letters in
+                  lexicon.get_candidates(crossed[0], crossed[-1])]
+
+    # 'sad' starts and 'as' ends on other keys, 'add' sweeps as 'ad'.
+    assert sorted(candidates) == ['ad', 'add']
+    assert 'sad' not in decoder.decode(path)
+    assert 'as' not in decoder.decode(path)
+
+
+def test_length_bounds_prune():
+    lexicon = swipe.Lexicon(['ad', 'ald'])
+    decoder = swipe.SwipeDecoder(lexicon)
+
+    # Crosses a and d in order, but is far too long for 'ad'.
+    assert decoder.decode(get_path(decoder, 'ald')) == ['ald']
+
+
+def test_decode_time_with_50k_words():
+    rand = random.Random(0)
+    decoder = swipe.SwipeDecoder(swipe.Lexicon())
+    letters = sorted(decoder.centers)
+
+    words = set()
+    while len(words) < 50000:
+        words.add(''.join(rand.choice(letters)
+                          for x in range(rand.randint(2, 10))))
+
+    words = sorted(words)
+    rand.shuffle(words)
+    decoder.lexicon = swipe.Lexicon(words)
+
+    slowest = 0.0
+    for word in words[:20]:
+        path = get_path(decoder, word)
+        start = time.perf_counter()
+        result = decoder.decode(path)
+        slowest = max(slowest, time.perf_counter() - start)
+
+        assert word in result
+
+    # Release has to feel instant, within a couple of frames.
+    assert slowest < FRAME * 2